@@ -13,11 +13,10 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
-import sqlite3
 import os
-import time
-import subprocess
-import sys
+from streamlit_autorefresh import st_autorefresh
+
+from realtime_data_collector import RealTimeDataCollector, connect_database
 
 
 # ============================================================================
@@ -36,7 +35,7 @@ st.set_page_config(
 # CUSTOM CSS STYLING
 # ============================================================================
 
-st.markdown("""
+CUSTOM_CSS = """
 <style>
 .main-header {
     font-size: 2.5rem;
@@ -69,43 +68,70 @@ st.markdown("""
     cursor: pointer;
 }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+# Streamlit drops any element a rerun does not emit again, so the style
+# block has to be sent on every run to stay applied
+st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
 
 
 # ============================================================================
 # DATABASE FUNCTIONS
 # ============================================================================
 
+@st.cache_resource(show_spinner=False)
+def _open_database():
+    # One connection shared by every session and rerun; Streamlit runs
+    # scripts on different threads, hence check_same_thread=False
+    return connect_database(check_same_thread=False)
+
+
 def get_database_connection():
     try:
-        return sqlite3.connect('hedging_data.db')
+        return _open_database()
     except Exception as e:
         st.error(f"Database connection error: {e}")
         return None
 
 
+# Stored timestamps are ISO strings, with or without fractional seconds
+TIMESTAMP_PARSING = {'timestamp': {'format': 'ISO8601'}}
+
+# float32 keeps ~7 significant digits: enough for the 2-decimal prices and the
+# 6-decimal JPY/INR rate (< 1), but not for jet fuel (~85, stored to 6 decimals)
+FUEL_DTYPES = {'brent_crude': 'float32', 'wti_crude': 'float32'}
+CURRENCY_DTYPES = {
+    'usd_inr': 'float32', 'eur_inr': 'float32', 'gbp_inr': 'float32', 'jpy_inr': 'float32'
+}
+
+
+@st.cache_data(ttl=60, show_spinner=False)
 def load_data():
     conn = get_database_connection()
     if conn is None:
         return None, None
     try:
+        # Rows are inserted in timestamp order, so the newest rows are the
+        # highest rowids; walking the rowid b-tree backwards needs no sort
         fuel_df = pd.read_sql_query(
-            "SELECT * FROM fuel_prices ORDER BY timestamp DESC LIMIT 100",
-            conn
+            "SELECT timestamp, jet_fuel, brent_crude, wti_crude "
+            "FROM fuel_prices ORDER BY rowid DESC LIMIT 100",
+            conn,
+            parse_dates=TIMESTAMP_PARSING,
+            dtype=FUEL_DTYPES
         )
-        fuel_df['timestamp'] = pd.to_datetime(fuel_df['timestamp'])
 
         currency_df = pd.read_sql_query(
-            "SELECT * FROM currency_rates ORDER BY timestamp DESC LIMIT 100",
-            conn
+            "SELECT timestamp, usd_inr, eur_inr, gbp_inr, jpy_inr "
+            "FROM currency_rates ORDER BY rowid DESC LIMIT 100",
+            conn,
+            parse_dates=TIMESTAMP_PARSING,
+            dtype=CURRENCY_DTYPES
         )
-        currency_df['timestamp'] = pd.to_datetime(currency_df['timestamp'])
 
-        conn.close()
         return fuel_df, currency_df
     except Exception as e:
         st.error(f"Error loading data: {e}")
-        conn.close()
         return None, None
 
 
@@ -113,20 +139,17 @@ def load_data():
 # DATA COLLECTION FUNCTIONS
 # ============================================================================
 
+@st.cache_resource(show_spinner=False)
+def get_data_collector():
+    return RealTimeDataCollector()
+
+
 def collect_realtime_data():
     try:
-        result = subprocess.run(
-            [sys.executable, 'realtime_data_collector.py'],
-            capture_output=True,
-            text=True,
-            timeout=30
-        )
-        if result.returncode == 0:
+        if get_data_collector().collect_and_store_realtime_data():
             return True, "Real-time data collected successfully!"
         else:
-            return False, f"Error: {result.stderr}"
-    except subprocess.TimeoutExpired:
-        return False, "Data collection timed out"
+            return False, "Error: real-time data collection failed"
     except Exception as e:
         return False, f"Error running data collector: {e}"
 
@@ -135,33 +158,39 @@ def collect_realtime_data():
 # VISUALIZATION FUNCTIONS
 # ============================================================================
 
-def create_fuel_chart(fuel_df):
-    if fuel_df.empty:
+# Chart builders go through cache_resource: the cached object is handed out
+# as-is instead of being pickled and re-validated by Plotly on every hit.
+# The frame itself is not hashed (leading underscore); the latest timestamp
+# and row count identify it. Each collection adds a key, so max_entries
+# bounds the cache
+@st.cache_resource(show_spinner=False, max_entries=4)
+def create_fuel_chart(_fuel_df, latest_ts, rows):
+    if _fuel_df.empty:
         return None
 
     fig = go.Figure()
 
-    fig.add_trace(go.Scatter(
-        x=fuel_df['timestamp'],
-        y=fuel_df['jet_fuel'],
+    fig.add_trace(go.Scattergl(
+        x=_fuel_df['timestamp'],
+        y=_fuel_df['jet_fuel'],
         mode='lines+markers',
         name='Jet Fuel',
         line=dict(color='#1f77b4', width=3),
         hovertemplate='<b>Jet Fuel</b><br>Time: %{x}<br>Price: $%{y:.3f}<extra></extra>'
     ))
 
-    fig.add_trace(go.Scatter(
-        x=fuel_df['timestamp'],
-        y=fuel_df['brent_crude'],
+    fig.add_trace(go.Scattergl(
+        x=_fuel_df['timestamp'],
+        y=_fuel_df['brent_crude'],
         mode='lines+markers',
         name='Brent Crude',
         line=dict(color='#ff7f0e', width=2),
         hovertemplate='<b>Brent Crude</b><br>Time: %{x}<br>Price: $%{y:.2f}<extra></extra>'
     ))
 
-    fig.add_trace(go.Scatter(
-        x=fuel_df['timestamp'],
-        y=fuel_df['wti_crude'],
+    fig.add_trace(go.Scattergl(
+        x=_fuel_df['timestamp'],
+        y=_fuel_df['wti_crude'],
         mode='lines+markers',
         name='WTI Crude',
         line=dict(color='#2ca02c', width=2),
@@ -180,8 +209,9 @@ def create_fuel_chart(fuel_df):
     return fig
 
 
-def create_currency_chart(currency_df):
-    if currency_df.empty:
+@st.cache_resource(show_spinner=False, max_entries=4)
+def create_currency_chart(_currency_df, latest_ts, rows):
+    if _currency_df.empty:
         return None
 
     fig = go.Figure()
@@ -191,9 +221,9 @@ def create_currency_chart(currency_df):
     columns = ['usd_inr', 'eur_inr', 'gbp_inr', 'jpy_inr']
 
     for i, (currency, column) in enumerate(zip(currencies, columns)):
-        fig.add_trace(go.Scatter(
-            x=currency_df['timestamp'],
-            y=currency_df[column],
+        fig.add_trace(go.Scattergl(
+            x=_currency_df['timestamp'],
+            y=_currency_df[column],
             mode='lines+markers',
             name=currency,
             line=dict(color=colors[i], width=2),
@@ -212,50 +242,68 @@ def create_currency_chart(currency_df):
     return fig
 
 
+# Snapshot charts are keyed on the latest scalar values, which are cheap to hash
+@st.cache_resource(show_spinner=False, max_entries=4)
+def create_fuel_snapshot_chart(jet_fuel, brent_crude, wti_crude):
+    fuel_snapshot = pd.DataFrame({
+        "Fuel Type": ["Jet Fuel", "Brent Crude", "WTI Crude"],
+        "Price ($/gallon)": [jet_fuel, brent_crude, wti_crude]
+    })
+    bar_fig = px.bar(fuel_snapshot, x="Fuel Type", y="Price ($/gallon)",
+                     color="Fuel Type", text_auto=".2f",
+                     title="Latest Fuel Price Comparison")
+    bar_fig.update_layout(showlegend=False, height=400)
+    return bar_fig
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def create_currency_snapshot_chart(usd_inr, eur_inr, gbp_inr, jpy_inr):
+    currency_snapshot = pd.DataFrame({
+        "Currency Pair": ["USD/INR", "EUR/INR", "GBP/INR", "JPY/INR"],
+        "Rate": [usd_inr, eur_inr, gbp_inr, jpy_inr]
+    })
+    pie_fig = px.pie(currency_snapshot, names="Currency Pair", values="Rate",
+                     title="Current Exchange Rate Proportions",
+                     hole=0.3,
+                     color_discrete_sequence=px.colors.sequential.Blues)
+    pie_fig.update_traces(textinfo='percent+label')
+    return pie_fig
+
+
 # ============================================================================
 # ANALYSIS FUNCTIONS
 # ============================================================================
 
+# Column -> key under which its latest percentage change is reported
+FUEL_CHANGE_KEYS = {
+    'jet_fuel': 'jet_fuel_change',
+    'brent_crude': 'brent_change',
+    'wti_crude': 'wti_change',
+}
+CURRENCY_CHANGE_KEYS = {
+    'usd_inr': 'usd_inr_change',
+    'eur_inr': 'eur_inr_change',
+    'gbp_inr': 'gbp_inr_change',
+    'jpy_inr': 'jpy_inr_change',
+}
+
+
+def _latest_changes(df, change_keys):
+    # Rows are newest first, so compare row 0 against row 1 for all columns at once
+    pair = df[list(change_keys)].iloc[:2]
+    return (pair.iloc[0] / pair.iloc[1] - 1).mul(100).rename(change_keys).to_dict()
+
+
 def calculate_price_changes(fuel_df, currency_df):
     if fuel_df.empty or currency_df.empty:
         return {}
 
     changes = {}
     if len(fuel_df) >= 2:
-        latest_fuel = fuel_df.iloc[0]
-        previous_fuel = fuel_df.iloc[1]
-        changes['jet_fuel_change'] = (
-            (latest_fuel['jet_fuel'] - previous_fuel['jet_fuel']) /
-            previous_fuel['jet_fuel'] * 100
-        )
-        changes['brent_change'] = (
-            (latest_fuel['brent_crude'] - previous_fuel['brent_crude']) /
-            previous_fuel['brent_crude'] * 100
-        )
-        changes['wti_change'] = (
-            (latest_fuel['wti_crude'] - previous_fuel['wti_crude']) /
-            previous_fuel['wti_crude'] * 100
-        )
+        changes.update(_latest_changes(fuel_df, FUEL_CHANGE_KEYS))
 
     if len(currency_df) >= 2:
-        latest_currency = currency_df.iloc[0]
-        previous_currency = currency_df.iloc[1]
-        changes['usd_inr_change'] = (
-            (latest_currency['usd_inr'] - previous_currency['usd_inr']) /
-            previous_currency['usd_inr'] * 100
-        )
-        changes['eur_inr_change'] = (
-            (latest_currency['eur_inr'] - previous_currency['eur_inr']) /
-            previous_currency['eur_inr'] * 100
-        )
-        changes['gbp_inr_change'] = (
-            (latest_currency['gbp_inr'] - previous_currency['gbp_inr']) /
-            previous_currency['gbp_inr'] * 100
-        )
-        changes['jpy_inr_change'] = (
-            (latest_currency['jpy_inr'] - previous_currency['jpy_inr']) /
-            previous_currency['jpy_inr'] * 100
-        )
+        changes.update(_latest_changes(currency_df, CURRENCY_CHANGE_KEYS))
 
     return changes
 
@@ -278,14 +326,15 @@ def main():
             success, message = collect_realtime_data()
             if success:
                 st.sidebar.success(message)
+                load_data.clear()
                 st.rerun()
             else:
                 st.sidebar.error(message)
 
     auto_refresh = st.sidebar.checkbox("Auto-refresh every 5 minutes", value=False)
     if auto_refresh:
-        time.sleep(300)
-        st.rerun()
+        # Scheduled in the browser, so no server thread sits blocked waiting
+        st_autorefresh(interval=300_000, key="autorefresh")
 
     st.sidebar.markdown("### Data Sources")
     st.sidebar.info("""
@@ -296,6 +345,8 @@ def main():
     # Load Data
     fuel_df, currency_df = load_data()
     if fuel_df is None or currency_df is None:
+        # Don't keep serving a failed load from the cache
+        load_data.clear()
         st.error("Unable to load data. Please check your database connection.")
         return
     if fuel_df.empty or currency_df.empty:
@@ -329,7 +380,8 @@ def main():
                   delta=f"{changes.get('eur_inr_change', 0):+.2f}%")
 
     # Data Freshness
-    latest_ts = max(fuel_df['timestamp'].max(), currency_df['timestamp'].max())
+    # Both frames are newest-first, so the first row holds the latest timestamp
+    latest_ts = max(fuel_df['timestamp'].iat[0], currency_df['timestamp'].iat[0])
     age = datetime.now() - latest_ts
     if age.total_seconds() < 300:
         st.success(f"🟢 Data is fresh (updated {age.seconds // 60} minutes ago)")
@@ -340,10 +392,14 @@ def main():
 
     # Charts
     st.markdown("## 📈 Real-Time Market Visualization")
-    fuel_chart = create_fuel_chart(fuel_df)
+    fuel_chart = create_fuel_chart(
+        fuel_df, fuel_df['timestamp'].iat[0], len(fuel_df)
+    )
     if fuel_chart:
         st.plotly_chart(fuel_chart, use_container_width=True)
-    currency_chart = create_currency_chart(currency_df)
+    currency_chart = create_currency_chart(
+        currency_df, currency_df['timestamp'].iat[0], len(currency_df)
+    )
     if currency_chart:
         st.plotly_chart(currency_chart, use_container_width=True)
 
@@ -356,45 +412,44 @@ def main():
 
     with col1:
         st.subheader("Fuel Price Comparison")
-        fuel_snapshot = pd.DataFrame({
-            "Fuel Type": ["Jet Fuel", "Brent Crude", "WTI Crude"],
-            "Price ($/gallon)": [
-                fuel_df["jet_fuel"].iloc[0],
-                fuel_df["brent_crude"].iloc[0],
-                fuel_df["wti_crude"].iloc[0]
-            ]
-        })
-        bar_fig = px.bar(fuel_snapshot, x="Fuel Type", y="Price ($/gallon)",
-                         color="Fuel Type", text_auto=".2f",
-                         title="Latest Fuel Price Comparison")
-        bar_fig.update_layout(showlegend=False, height=400)
-        st.plotly_chart(bar_fig, use_container_width=True)
+        bar_chart = create_fuel_snapshot_chart(
+            float(fuel_df["jet_fuel"].iloc[0]),
+            float(fuel_df["brent_crude"].iloc[0]),
+            float(fuel_df["wti_crude"].iloc[0])
+        )
+        st.plotly_chart(bar_chart, use_container_width=True)
 
     with col2:
         st.subheader("Currency Exposure Distribution")
-        currency_snapshot = pd.DataFrame({
-            "Currency Pair": ["USD/INR", "EUR/INR", "GBP/INR", "JPY/INR"],
-            "Rate": [
-                currency_df["usd_inr"].iloc[0],
-                currency_df["eur_inr"].iloc[0],
-                currency_df["gbp_inr"].iloc[0],
-                currency_df["jpy_inr"].iloc[0]
-            ]
-        })
-        pie_fig = px.pie(currency_snapshot, names="Currency Pair", values="Rate",
-                         title="Current Exchange Rate Proportions",
-                         hole=0.3,
-                         color_discrete_sequence=px.colors.sequential.Blues)
-        pie_fig.update_traces(textinfo='percent+label')
-        st.plotly_chart(pie_fig, use_container_width=True)
+        pie_chart = create_currency_snapshot_chart(
+            float(currency_df["usd_inr"].iloc[0]),
+            float(currency_df["eur_inr"].iloc[0]),
+            float(currency_df["gbp_inr"].iloc[0]),
+            float(currency_df["jpy_inr"].iloc[0])
+        )
+        st.plotly_chart(pie_chart, use_container_width=True)
 
     # Data Tables
     st.markdown("## 📋 Recent Market Data")
     tab1, tab2 = st.tabs(["Fuel Prices", "Currency Rates"])
+    # Timestamp formatting happens in the browser grid, not in pandas
+    table_config = {
+        'timestamp': st.column_config.DatetimeColumn(format="YYYY-MM-DD HH:mm:ss"),
+        # Round for display so float32 columns don't show representation noise
+        'jet_fuel': st.column_config.NumberColumn(format="%.6f"),
+        'brent_crude': st.column_config.NumberColumn(format="%.2f"),
+        'wti_crude': st.column_config.NumberColumn(format="%.2f"),
+        'usd_inr': st.column_config.NumberColumn(format="%.2f"),
+        'eur_inr': st.column_config.NumberColumn(format="%.2f"),
+        'gbp_inr': st.column_config.NumberColumn(format="%.2f"),
+        'jpy_inr': st.column_config.NumberColumn(format="%.6f"),
+    }
     with tab1:
-        st.dataframe(fuel_df.head(10), use_container_width=True)
+        st.dataframe(fuel_df.iloc[:10], use_container_width=True,
+                     hide_index=True, column_config=table_config)
     with tab2:
-        st.dataframe(currency_df.head(10), use_container_width=True)
+        st.dataframe(currency_df.iloc[:10], use_container_width=True,
+                     hide_index=True, column_config=table_config)
 
     # Hedging Recommendations
     st.markdown("## 🛡️ Real-Time Hedging Recommendations")
@@ -2,42 +2,91 @@
 Real-time Data Collector for Indigo Airlines Hedging System
 Fetches live fuel prices and currency rates from APIs
 """
-import requests
+import httpx
+from curl_cffi import requests as curl_requests
+import numpy as np
 import pandas as pd
 import yfinance as yf
 from datetime import datetime, timedelta
 import sqlite3
+import threading
 import time
 import logging
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+DB_PATH = 'hedging_data.db'
+
+# yf.download keeps per-call progress in module-global state, so two downloads
+# running at once in this process can lose each other's tickers or never finish
+YF_DOWNLOAD_LOCK = threading.Lock()
+
+# WAL lets the dashboard read while the collector writes; NORMAL sync is
+# durable under WAL and avoids an fsync on every commit
+SQLITE_PRAGMAS = (
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "busy_timeout=5000",
+    "cache_size=-20000",
+    "temp_store=memory",
+)
+
+
+def current_timestamp() -> str:
+    """Current local time as the ISO string stored in the timestamp columns"""
+    # Binding a str skips sqlite3's per-row datetime adapter on insert
+    return datetime.now().isoformat(sep=' ', timespec='seconds')
+
+
+def connect_database(path: str = DB_PATH, **kwargs) -> sqlite3.Connection:
+    """Open a SQLite connection with the shared PRAGMA tuning applied"""
+    conn = sqlite3.connect(path, **kwargs)
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(f"PRAGMA {pragma}")
+    return conn
+
 class RealTimeDataCollector:
+    FUEL_SYMBOLS = ("BZ=F", "CL=F")  # Brent / WTI Crude Futures
+    CURRENCY_SYMBOLS = ("USDINR=X", "EURINR=X", "GBPINR=X", "JPYINR=X")
+    # How long ExchangeRate-API gets to answer before Yahoo is queried too
+    PRIMARY_GRACE_SECONDS = 2.0
+    # Upper bound on waiting for any currency provider
+    CURRENCY_TIMEOUT_SECONDS = 30.0
+    
     def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
+        # HTTP/2 lets requests to the same provider share one TLS connection
+        self.client = httpx.Client(http2=True, timeout=10, headers={
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         })
+        # Runs the currency providers side by side in get_live_currency_rates
+        self.executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="currency")
+        # Reused for every collection cycle instead of reconnecting per store.
+        # The dashboard shares one collector across sessions, so writes on the
+        # connection are serialized to keep each transaction intact
+        self.conn = connect_database(check_same_thread=False)
+        self.conn_lock = threading.Lock()
+        # Whole collections run one at a time as well: overlapping ones would
+        # issue concurrent yf.download calls
+        self.collect_lock = threading.Lock()
+        # yf.download opens a new session per call unless given one; keep a
+        # single curl_cffi session (the only kind yfinance accepts) so every
+        # collection cycle reuses its connections to Yahoo
+        self.yf_session = curl_requests.Session(impersonate="chrome")
         
     def get_live_fuel_prices(self) -> Optional[Dict]:
         """Get live fuel prices from multiple sources"""
         try:
             logger.info("Fetching live fuel prices...")
             
-            # Get crude oil prices from Yahoo Finance
-            brent_ticker = yf.Ticker("BZ=F")  # Brent Crude Futures
-            wti_ticker = yf.Ticker("CL=F")    # WTI Crude Futures
-            
-            # Get latest prices
-            brent_data = brent_ticker.history(period="1d")
-            wti_data = wti_ticker.history(period="1d")
+            # Get crude oil prices from Yahoo Finance in one batched request
+            closes = self._fetch_latest_closes(self.FUEL_SYMBOLS)
+            brent_price = closes["BZ=F"]
+            wti_price = closes["CL=F"]
             
-            if not brent_data.empty and not wti_data.empty:
-                brent_price = brent_data['Close'].iloc[-1]
-                wti_price = wti_data['Close'].iloc[-1]
+            if brent_price is not None and wti_price is not None:
                 
                 # Estimate jet fuel price (typically 1.2-1.5x crude oil price)
                 jet_fuel_price = (brent_price + wti_price) / 2 * 1.35
@@ -46,7 +95,7 @@ class RealTimeDataCollector:
                     'jet_fuel': round(jet_fuel_price, 6),
                     'brent_crude': round(brent_price, 2),
                     'wti_crude': round(wti_price, 2),
-                    'timestamp': datetime.now()
+                    'timestamp': current_timestamp()
                 }
                 
                 logger.info(f"Live fuel prices collected: {fuel_prices}")
@@ -64,53 +113,24 @@ class RealTimeDataCollector:
         try:
             logger.info("Fetching live currency rates...")
             
-            # Method 1: Try exchangerate-api.com (free tier)
-            try:
-                response = self.session.get('https://api.exchangerate-api.com/v4/latest/USD', timeout=10)
-                if response.status_code == 200:
-                    data = response.json()
-                    rates = data['rates']
-                    
-                    currency_rates = {
-                        'usd_inr': round(rates.get('INR', 83.0), 2),
-                        'eur_inr': round(rates.get('INR', 83.0) / rates.get('EUR', 0.85), 2),
-                        'gbp_inr': round(rates.get('INR', 83.0) / rates.get('GBP', 0.73), 2),
-                        'jpy_inr': round(rates.get('INR', 83.0) / rates.get('JPY', 110.0), 6),
-                        'timestamp': datetime.now()
-                    }
-                    
-                    logger.info(f"Live currency rates collected: {currency_rates}")
-                    return currency_rates
-                    
-            except Exception as e:
-                logger.warning(f"ExchangeRate API failed: {e}")
+            # ExchangeRate-API is the preferred source, so consecutive rows
+            # don't flip between providers and show their spread as a price
+            # movement. Yahoo is only started once the primary has failed or
+            # overrun its grace window; from then on whichever answers first
+            # wins, and a slow primary no longer delays the fallback by its
+            # full timeout
+            primary = self.executor.submit(self._get_exchangerate_api_rates)
+            wait([primary], timeout=self.PRIMARY_GRACE_SECONDS)
+            futures = [primary]
+            if not (primary.done() and primary.result()):
+                futures.append(self.executor.submit(self._get_yahoo_currency_rates))
             
-            # Method 2: Try Yahoo Finance for currency pairs
-            try:
-                usd_inr = yf.Ticker("USDINR=X")
-                eur_inr = yf.Ticker("EURINR=X")
-                gbp_inr = yf.Ticker("GBPINR=X")
-                jpy_inr = yf.Ticker("JPYINR=X")
-                
-                usd_data = usd_inr.history(period="1d")
-                eur_data = eur_inr.history(period="1d")
-                gbp_data = gbp_inr.history(period="1d")
-                jpy_data = jpy_inr.history(period="1d")
-                
-                if not usd_data.empty:
-                    currency_rates = {
-                        'usd_inr': round(usd_data['Close'].iloc[-1], 2),
-                        'eur_inr': round(eur_data['Close'].iloc[-1], 2) if not eur_data.empty else 90.0,
-                        'gbp_inr': round(gbp_data['Close'].iloc[-1], 2) if not gbp_data.empty else 105.0,
-                        'jpy_inr': round(jpy_data['Close'].iloc[-1], 6) if not jpy_data.empty else 0.55,
-                        'timestamp': datetime.now()
-                    }
-                    
-                    logger.info(f"Live currency rates collected via Yahoo Finance: {currency_rates}")
+            for future in as_completed(futures, timeout=self.CURRENCY_TIMEOUT_SECONDS):
+                currency_rates = future.result()
+                if currency_rates:
+                    # A losing provider keeps running in the background, bounded
+                    # by its own timeout, and holds a pool worker until then
                     return currency_rates
-                    
-            except Exception as e:
-                logger.warning(f"Yahoo Finance currency API failed: {e}")
             
             # Fallback to sample data
             return self._get_fallback_currency_rates()
@@ -119,6 +139,82 @@ class RealTimeDataCollector:
             logger.error(f"Error fetching live currency rates: {e}")
             return self._get_fallback_currency_rates()
     
+    def _get_exchangerate_api_rates(self) -> Optional[Dict]:
+        """Currency rates from exchangerate-api.com (free tier)"""
+        try:
+            response = self.client.get('https://api.exchangerate-api.com/v4/latest/USD')
+            if response.status_code == 200:
+                data = response.json()
+                rates = data['rates']
+                
+                # USD-based quotes -> INR cross rates for USD, EUR, GBP, JPY.
+                # A missing currency raises so the Yahoo provider is used instead
+                # of mixing live and hard-coded rates
+                inr_rates = rates['INR'] / np.array(
+                    [1.0, rates['EUR'], rates['GBP'], rates['JPY']]
+                )
+                usd_inr, eur_inr, gbp_inr = np.round(inr_rates[:3], 2).tolist()
+                
+                currency_rates = {
+                    'usd_inr': usd_inr,
+                    'eur_inr': eur_inr,
+                    'gbp_inr': gbp_inr,
+                    'jpy_inr': round(float(inr_rates[3]), 6),
+                    'timestamp': current_timestamp()
+                }
+                
+                logger.info(f"Live currency rates collected: {currency_rates}")
+                return currency_rates
+                
+        except Exception as e:
+            logger.warning(f"ExchangeRate API failed: {e}")
+        return None
+    
+    def _get_yahoo_currency_rates(self) -> Optional[Dict]:
+        """Currency rates from Yahoo Finance currency pairs"""
+        try:
+            closes = self._fetch_latest_closes(self.CURRENCY_SYMBOLS)
+            usd_close = closes["USDINR=X"]
+            eur_close = closes["EURINR=X"]
+            gbp_close = closes["GBPINR=X"]
+            jpy_close = closes["JPYINR=X"]
+            
+            # Only a complete set of live pairs counts; filling gaps with
+            # hard-coded rates would let a partial answer pass as live data
+            if None in (usd_close, eur_close, gbp_close, jpy_close):
+                missing = [symbol for symbol, close in closes.items() if close is None]
+                logger.warning(f"Yahoo Finance returned no rate for {missing}")
+                return None
+            
+            currency_rates = {
+                'usd_inr': round(usd_close, 2),
+                'eur_inr': round(eur_close, 2),
+                'gbp_inr': round(gbp_close, 2),
+                'jpy_inr': round(jpy_close, 6),
+                'timestamp': current_timestamp()
+            }
+            
+            logger.info(f"Live currency rates collected via Yahoo Finance: {currency_rates}")
+            return currency_rates
+                
+        except Exception as e:
+            logger.warning(f"Yahoo Finance currency API failed: {e}")
+        return None
+    
+    def _fetch_latest_closes(self, symbols: Tuple[str, ...]) -> Dict[str, Optional[float]]:
+        """Get the latest close for several tickers with one batched download"""
+        with YF_DOWNLOAD_LOCK:
+            data = yf.download(list(symbols), period="1d", group_by='ticker',
+                               threads=True, progress=False, session=self.yf_session)
+        closes = {}
+        for symbol in symbols:
+            if symbol in data.columns.get_level_values(0):
+                series = data[symbol]['Close'].dropna()
+            else:
+                series = pd.Series(dtype=float)
+            closes[symbol] = series.iloc[-1] if not series.empty else None
+        return closes
+    
     def _get_fallback_fuel_prices(self) -> Dict:
         """Fallback fuel prices when APIs fail"""
         import random
@@ -126,7 +222,7 @@ class RealTimeDataCollector:
             'jet_fuel': round(random.uniform(2.3, 2.6), 6),
             'brent_crude': round(random.uniform(60, 70), 2),
             'wti_crude': round(random.uniform(55, 65), 2),
-            'timestamp': datetime.now()
+            'timestamp': current_timestamp()
         }
     
     def _get_fallback_currency_rates(self) -> Dict:
@@ -137,38 +233,49 @@ class RealTimeDataCollector:
             'eur_inr': round(random.uniform(102, 105), 2),
             'gbp_inr': round(random.uniform(117, 120), 2),
             'jpy_inr': round(random.uniform(0.57, 0.58), 6),
-            'timestamp': datetime.now()
+            'timestamp': current_timestamp()
         }
     
-    def store_data_in_database(self, fuel_prices: Dict, currency_rates: Dict):
-        """Store collected data in SQLite database"""
-        try:
-            conn = sqlite3.connect('hedging_data.db')
-            
-            # Store fuel prices
-            conn.execute('''
+    def store_many(self, fuel_rows: List[Tuple], currency_rows: List[Tuple]):
+        """Insert batches of fuel and currency rows in a single transaction"""
+        with self.conn_lock, self.conn:
+            self.conn.executemany('''
                 INSERT INTO fuel_prices (timestamp, jet_fuel, brent_crude, wti_crude)
                 VALUES (?, ?, ?, ?)
-            ''', (fuel_prices['timestamp'], fuel_prices['jet_fuel'], 
-                  fuel_prices['brent_crude'], fuel_prices['wti_crude']))
-            
-            # Store currency rates
-            conn.execute('''
+            ''', fuel_rows)
+            self.conn.executemany('''
                 INSERT INTO currency_rates (timestamp, usd_inr, eur_inr, gbp_inr, jpy_inr)
                 VALUES (?, ?, ?, ?, ?)
-            ''', (currency_rates['timestamp'], currency_rates['usd_inr'],
-                  currency_rates['eur_inr'], currency_rates['gbp_inr'], currency_rates['jpy_inr']))
-            
-            conn.commit()
-            conn.close()
+            ''', currency_rows)
+    
+    def store_data_in_database(self, fuel_prices: Dict, currency_rates: Dict):
+        """Store collected data in SQLite database"""
+        try:
+            self.store_many(
+                [(fuel_prices['timestamp'], fuel_prices['jet_fuel'],
+                  fuel_prices['brent_crude'], fuel_prices['wti_crude'])],
+                [(currency_rates['timestamp'], currency_rates['usd_inr'],
+                  currency_rates['eur_inr'], currency_rates['gbp_inr'], currency_rates['jpy_inr'])]
+            )
             
             logger.info("Data stored in database successfully")
             
         except Exception as e:
             logger.error(f"Error storing data in database: {e}")
     
+    def close(self):
+        """Release the collector's database connection, HTTP sessions and worker threads"""
+        self.conn.close()
+        self.client.close()
+        self.yf_session.close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+    
     def collect_and_store_realtime_data(self):
         """Main function to collect and store real-time data"""
+        with self.collect_lock:
+            return self._collect_and_store_realtime_data()
+    
+    def _collect_and_store_realtime_data(self):
         try:
             logger.info("Starting real-time data collection...")
             
@@ -180,20 +287,18 @@ class RealTimeDataCollector:
                 # Store in database
                 self.store_data_in_database(fuel_prices, currency_rates)
                 
-                print("\n" + "="*60)
-                print("REAL-TIME DATA COLLECTION COMPLETED")
-                print("="*60)
-                print(f"Timestamp: {datetime.now()}")
-                print("\nFuel Prices:")
-                print(f"  Jet Fuel: ${fuel_prices['jet_fuel']:.3f}")
-                print(f"  Brent Crude: ${fuel_prices['brent_crude']:.2f}")
-                print(f"  WTI Crude: ${fuel_prices['wti_crude']:.2f}")
-                print("\nCurrency Rates:")
-                print(f"  USD/INR: ₹{currency_rates['usd_inr']:.2f}")
-                print(f"  EUR/INR: ₹{currency_rates['eur_inr']:.2f}")
-                print(f"  GBP/INR: ₹{currency_rates['gbp_inr']:.2f}")
-                print(f"  JPY/INR: ₹{currency_rates['jpy_inr']:.6f}")
-                print("="*60)
+                # Logged rather than printed: inside the dashboard this runs
+                # in the Streamlit server process
+                logger.info(
+                    "Real-time data collection completed\n"
+                    f"  Jet Fuel: ${fuel_prices['jet_fuel']:.3f}\n"
+                    f"  Brent Crude: ${fuel_prices['brent_crude']:.2f}\n"
+                    f"  WTI Crude: ${fuel_prices['wti_crude']:.2f}\n"
+                    f"  USD/INR: ₹{currency_rates['usd_inr']:.2f}\n"
+                    f"  EUR/INR: ₹{currency_rates['eur_inr']:.2f}\n"
+                    f"  GBP/INR: ₹{currency_rates['gbp_inr']:.2f}\n"
+                    f"  JPY/INR: ₹{currency_rates['jpy_inr']:.6f}"
+                )
                 
                 return True
             else:
@@ -215,6 +320,7 @@ def main():
     print("This may take a few seconds...")
     
     success = collector.collect_and_store_realtime_data()
+    collector.close()
     
     if success:
                 print("\nSUCCESS: Real-time data collection successful!")
@@ -225,4 +331,6 @@ def main():
         print("FALLBACK: Using fallback data instead")
 
 if __name__ == "__main__":
+    # Only configure logging when run as a script, not when the dashboard imports us
+    logging.basicConfig(level=logging.INFO)
     main()